@@ -1,5 +1,9 @@
 import os
 import json
+import orjson
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
 
 
 def _verify_all_keys_exist(expected, actual):
@@ -41,9 +45,16 @@ def verify_all(expected, actual):
     return True
 
 
-def validate_responses(testcases):
-    for testcase in testcases:
-        actual = testcase.callback()
+def validate_responses(testcases, max_workers=1):
+    if max_workers == 1:
+        # lazily call one after the other, stop at the first failure
+        results = (testcase.callback() for testcase in testcases)
+    else:
+        # fetch concurrently, validate the results in order
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(testcase.callback) for testcase in testcases]
+        results = (future.result() for future in futures)
+    for testcase, actual in zip(testcases, results):
         print("{}... ".format(testcase.msg), end="")
         verifications = []
         if type(actual) == tuple:
@@ -65,9 +76,10 @@ def find_expectations(name):
 
 
 def persist_contract(name, remote, data):
-    with open("contracts/{}/{}".format(remote, name), "w") as fh:
-        json.dump(data, fh, indent=2)
-        fh.write("\n")
+    with open("contracts/{}/{}".format(remote, name), "wb") as fh:
+        fh.write(
+            orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+        )
 
 
 class ContractDataName:
@@ -76,6 +88,8 @@ class ContractDataName:
         self.data = data
 
 
+# Contracts are read-only once loaded, share the parsed data between callers.
+@functools.lru_cache(maxsize=None)
 def get_contract_json(name, remote):
     with open("contracts/{}/{}".format(remote, name)) as fh:
         data_json = json.load(fh)
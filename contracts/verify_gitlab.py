@@ -1,25 +1,96 @@
 import requests
 import json
+import copy
+import orjson
 import os
+import functools
 import argparse
 
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from validation import validate_responses
 from validation import persist_contract
 from validation import get_contract_json
 
-PRIVATE_TOKEN = os.environ["GITLAB_TOKEN"]
 REMOTE = "gitlab"
+# Contract callbacks are independent network round-trips, fetch them
+# concurrently
+MAX_WORKERS = 8
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--persist", action="store_true")
-args = parser.parse_args()
+# Parsed in main(), keep the module importable without side effects
+args = argparse.Namespace(persist=False)
+
+# All endpoints live on gitlab.com, share one session to reuse connections
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=MAX_WORKERS,
+        max_retries=Retry(
+            total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]
+        ),
+    ),
+)
+
+API_URL = "https://gitlab.com/api/v4"
+PROJECT_URL = f"{API_URL}/projects/jordilin%2Fgitlapi"
+REGISTRY_URL = f"{PROJECT_URL}/registry/repositories"
+URLS = {
+    "project": PROJECT_URL,
+    "members": f"{API_URL}/projects/gitlab-org%2Fgitlab/members",
+    "merge_requests": f"{PROJECT_URL}/merge_requests",
+    # https://docs.gitlab.com/ee/api/pipelines.html
+    "pipelines": f"{PROJECT_URL}/pipelines",
+    "registry_repositories": f"{REGISTRY_URL}?tags_count=true",
+    "registry_repository_tags": f"{REGISTRY_URL}/6120360/tags",
+    "registry_repository_tag": f"{REGISTRY_URL}/6120360/tags/v0.0.1",
+    "releases": f"{PROJECT_URL}/releases",
+    "user": f"{API_URL}/user",
+    "project_runners": f"{PROJECT_URL}/runners",
+    "starred_projects": f"{API_URL}/users/jordilin/starred_projects",
+}
+
+# Body of the already existing merge request, re-created to trigger a 409
+MR_BODY = orjson.dumps(
+    {
+        "source_branch": "feature",
+        "target_branch": "main",
+        "title": "New Feature",
+    }
+)
+
+
+# Contract files are written in the background so that disk I/O overlaps
+# with the remaining requests. main() waits for them and surfaces errors.
+IO_POOL = ThreadPoolExecutor(max_workers=4)
+PERSIST_FUTURES = []
+
+
+def _persist(name, data):
+    PERSIST_FUTURES.append(IO_POOL.submit(persist_contract, name, REMOTE, data))
+
+
+def _json(response):
+    return orjson.loads(response.content)
+
+
+def _fetch_full(url):
+    response = SESSION.get(url)
+    return _json(response), response
+
+
+def _fetch(url):
+    return _json(SESSION.get(url))
 
 
 def get_project_api_json():
-    url = "https://gitlab.com/api/v4/projects/jordilin%2Fgitlapi"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _fetch(URLS["project"])
 
     data["runners_token"] = "REDACTED"
     data["namespace"]["avatar_url"] = "https://any_url_test.test"
@@ -29,43 +100,37 @@ def get_project_api_json():
     # change to a long time ago to avoid flaky tests
     data["container_expiration_policy"]["next_run_at"] = "2060-03-20T06:26:02.725Z"
     if args.persist:
-        persist_contract("project.json", REMOTE, data)
+        _persist("project.json", data)
     return data
 
 
 def get_project_members_api_json():
-    url = "https://gitlab.com/api/v4/projects/gitlab-org%2Fgitlab/members"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
     # members API is paginated, gather headers to test pagination
-    response = requests.get(url, headers=headers)
-    # take first two members and fake data
-    data = response.json()[:2]
+    all_members, response = _fetch_full(URLS["members"])
+    # take a copy of the first two members and fake data, keep upstream intact
+    data = copy.deepcopy(all_members[:2])
     for i, member in enumerate(data):
-        member["avatar_url"] = "https://any_url_test.test" + str(i)
-        member["web_url"] = "https://any_url_test.test" + str(i)
-        member["id"] = i + 123456
-        member["username"] = "test_user_" + str(i)
-        member["name"] = "Test User " + str(i)
-        member["created_by"]["avatar_url"] = "https://any_url_test.test" + str(i)
-        member["created_by"]["web_url"] = "https://any_url_test.test" + str(i)
-        member["created_by"]["id"] = i + 123456
-        member["created_by"]["username"] = "test_user_" + str(i)
-        member["created_by"]["name"] = "Test User " + str(i)
+        url = f"https://any_url_test.test{i}"
+        fake = {
+            "avatar_url": url,
+            "web_url": url,
+            "id": i + 123456,
+            "username": f"test_user_{i}",
+            "name": f"Test User {i}",
+        }
+        member.update(fake)
+        member["created_by"].update(fake)
     if args.persist:
-        persist_contract("project_members.json", REMOTE, data)
-        persist_contract(
-            "project_members_response_headers.json", REMOTE, dict(response.headers)
-        )
-    return response.json()
+        _persist("project_members.json", data)
+        _persist("project_members_response_headers.json", dict(response.headers))
+    return all_members
 
 
 def merge_request_api():
-    mr_base_url = "https://gitlab.com/api/v4/projects/jordilin%2Fgitlapi/merge_requests"
-    existing_mr_url = f"{mr_base_url}/33"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(existing_mr_url, headers=headers)
+    mr_base_url = URLS["merge_requests"]
+    response = SESSION.get(f"{mr_base_url}/33")
     assert response.status_code == 200
-    data = response.json()
+    data = _json(response)
     author = data["author"]
     author["id"] = 123456
     author["avatar_url"] = "https://any_url_test.test"
@@ -73,110 +138,86 @@ def merge_request_api():
     user["id"] = 123456
     user["avatar_url"] = "https://any_url_test.test"
     if args.persist:
-        persist_contract("merge_request.json", REMOTE, data)
+        _persist("merge_request.json", data)
     # re-create - response with a 409
-    body = {
-        "source_branch": "feature",
-        "target_branch": "main",
-        "title": "New Feature",
-    }
-    response = requests.post(mr_base_url, headers=headers, data=body)
+    response = SESSION.post(
+        mr_base_url, data=MR_BODY, headers={"Content-Type": "application/json"}
+    )
     assert response.status_code == 409
-    data_conflict = response.json()
+    data_conflict = _json(response)
     if args.persist:
-        persist_contract("merge_request_conflict.json", REMOTE, data_conflict)
+        _persist("merge_request_conflict.json", data_conflict)
     return data, data_conflict
 
 
 def list_pipelines_api():
-    # https://docs.gitlab.com/ee/api/pipelines.html
-    url = "https://gitlab.com/api/v4/projects/jordilin%2Fgitlapi/pipelines"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _fetch(URLS["pipelines"])
     if args.persist:
-        persist_contract("list_pipelines.json", REMOTE, data)
+        _persist("list_pipelines.json", data)
     return data[0]
 
 
 def list_registry_repositories_api():
-    url = "https://gitlab.com/api/v4/projects/jordilin%2Fgitlapi/registry/repositories?tags_count=true"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _fetch(URLS["registry_repositories"])
     if args.persist:
-        persist_contract("list_registry_repositories.json", REMOTE, data)
+        _persist("list_registry_repositories.json", data)
     return data[0]
 
 
 def list_registry_repository_tags_api():
-    url = "https://gitlab.com/api/v4/projects/jordilin%2Fgitlapi/registry/repositories/6120360/tags"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _fetch(URLS["registry_repository_tags"])
     if args.persist:
-        persist_contract("list_registry_repository_tags.json", REMOTE, data)
+        _persist("list_registry_repository_tags.json", data)
     return data[0]
 
 
 def get_registry_repository_tag_api():
-    url = "https://gitlab.com/api/v4/projects/jordilin%2Fgitlapi/registry/repositories/6120360/tags/v0.0.1"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _fetch(URLS["registry_repository_tag"])
     if args.persist:
-        persist_contract("get_registry_repository_tag.json", REMOTE, data)
+        _persist("get_registry_repository_tag.json", data)
     return data
 
 
 def list_releases_api():
-    url = "https://gitlab.com/api/v4/projects/jordilin%2Fgitlapi/releases"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _fetch(URLS["releases"])
     if args.persist:
-        persist_contract("list_releases.json", REMOTE, data)
+        _persist("list_releases.json", data)
     return data[0]
 
 
 def list_get_user_info():
-    url = "https://gitlab.com/api/v4/user"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _fetch(URLS["user"])
     if args.persist:
-        persist_contract("get_user_info.json", REMOTE, data)
+        _persist("get_user_info.json", data)
     return data
 
 
+# Shared by the runner contracts, so they do not depend on each other's order
+@functools.lru_cache(maxsize=None)
+def _project_runners():
+    return _fetch(URLS["project_runners"])
+
+
 def list_gitlab_project_runners_api():
-    url = "https://gitlab.com/api/v4/projects/jordilin%2Fgitlapi/runners"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _project_runners()
     if args.persist:
-        persist_contract("list_project_runners.json", REMOTE, data)
+        _persist("list_project_runners.json", data)
     return data[0]
 
 
 def get_runner_details_api():
-    runner = get_contract_json("list_project_runners.json", REMOTE).data
-    url = f"https://gitlab.com/api/v4/runners/{runner['id']}"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    runner = _project_runners()[0]
+    url = f"{API_URL}/runners/{runner['id']}"
+    data = _fetch(url)
     if args.persist:
-        persist_contract("get_runner_details.json", REMOTE, data)
+        _persist("get_runner_details.json", data)
     return data
 
 
 def list_user_starred_projects():
-    url = "https://gitlab.com/api/v4/users/jordilin/starred_projects"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    data = _fetch(URLS["starred_projects"])
     if args.persist:
-        persist_contract("stars.json", REMOTE, data)
+        _persist("stars.json", data)
     return data[0]
 
 
@@ -187,7 +228,10 @@ class TestAPI:
         self.expected = expected
 
 
-if __name__ == "__main__":
+def main():
+    global args
+    args = parser.parse_args()
+    SESSION.headers["PRIVATE-TOKEN"] = os.environ["GITLAB_TOKEN"]
     testcases = [
         TestAPI(
             get_project_api_json,
@@ -246,7 +290,15 @@ if __name__ == "__main__":
             get_contract_json("stars.json", REMOTE),
         ),
     ]
-    if not validate_responses(testcases):
+    valid = validate_responses(testcases, max_workers=MAX_WORKERS)
+    IO_POOL.shutdown(wait=True)
+    for future in PERSIST_FUTURES:
+        future.result()
+    if not valid:
         exit(1)
     # TODO
     # # get_project_members_api_json()
+
+
+if __name__ == "__main__":
+    main()
@@ -92,6 +92,8 @@
             sccache
             just
             python311Packages.requests
+            python311Packages.orjson
+            python311Packages.brotli
             python311Packages.black
             # Github actions locally for fast iteration
             act